@@ -0,0 +1,114 @@
+# Memory benchmark for realtime session state
+# benchmarks/session_memory.py
+#
+# Usage (from backend/):
+#   python benchmarks/session_memory.py                    # 10k sessions, 20 turns each
+#   python benchmarks/session_memory.py --sessions 10000 --turns 50
+
+import gc
+import os
+import sys
+import argparse
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from main import RealtimeSession  # noqa: E402
+from transcript import Role  # noqa: E402
+
+# Short utterances repeat a lot in practice conversations; mix them with unique
+# short and long text so unbounded caching of either shows up as retained memory
+PHRASES = ["Okay.", "Yes.", "I see.", "Could you say more about that?", "Thanks, that helps."]
+
+
+class LegacySession:
+    """The previous representation: plain object, dict metadata, list of dict turns"""
+
+    def __init__(self, session_id: str, call_id=None):
+        self.session_id = session_id
+        self.call_id = call_id
+        self.websocket_to_openai = None
+        self.client_websocket = None
+        self.is_active = False
+        self.transcript_buffer = []
+        self.metadata = {}
+
+
+def _text(session_index: int, turn: int) -> str:
+    if turn % 2:
+        return PHRASES[turn % len(PHRASES)]
+    # Built at runtime, as transcripts arriving from the network would be
+    if turn % 4:
+        return "".join(["Call me ", str(session_index), "-", str(turn), "."])
+    return "".join(["Session ", str(session_index), " turn ", str(turn), " says something new"])
+
+
+def _legacy_turn(session: LegacySession, i: int, turn: int):
+    session.transcript_buffer.append({
+        "timestamp": datetime.utcnow().isoformat(),
+        "type": "assistant" if turn % 2 else "user",
+        "text": _text(i, turn),
+    })
+
+
+def _compact_turn(session: RealtimeSession, i: int, turn: int):
+    session.transcript_buffer.append(Role.ASSISTANT if turn % 2 else Role.USER, _text(i, turn))
+
+
+def measure(factory, add_turn, sessions: int, turns: int):
+    """Return (bytes per session with no turns, bytes per turn, bytes still held after dropping all sessions)"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    pool = [factory(f"session-{i:06d}") for i in range(sessions)]
+    empty = tracemalloc.get_traced_memory()[0]
+    for i, session in enumerate(pool):
+        for turn in range(turns):
+            add_turn(session, i, turn)
+    full = tracemalloc.get_traced_memory()[0]
+    # Closed sessions must give their memory back; only the bounded shared-text cache may remain
+    del pool, session
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    per_session = (empty - base) / sessions
+    per_turn = (full - empty) / (sessions * turns) if turns else 0.0
+    return per_session, per_turn, retained
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be at least 0")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Realtime session memory benchmark")
+    parser.add_argument("--sessions", type=positive_int, default=10000)
+    parser.add_argument("--turns", type=non_negative_int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} concurrent sessions, {args.turns} turns each")
+    results = {
+        "legacy": measure(LegacySession, _legacy_turn, args.sessions, args.turns),
+        "compact": measure(RealtimeSession, _compact_turn, args.sessions, args.turns),
+    }
+    for name, (per_session, per_turn, retained) in results.items():
+        total = per_session + per_turn * args.turns
+        print(f"{name:<8} {per_session:8.1f} B/session  {per_turn:8.1f} B/turn  "
+              f"{total * args.sessions / 2 ** 20:8.1f} MiB total  "
+              f"{retained / 2 ** 10:8.1f} KiB retained after close")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Import-time and cold-start benchmark for the backend
+# benchmarks/startup.py
+#
+# Usage (from backend/):
+#   python benchmarks/startup.py              # import time + cold start to /ready
+#   python benchmarks/startup.py --runs 10 --budget 1.0
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # The key is only checked at startup; a placeholder is enough to boot
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    return env
+
+
+def measure_import(runs: int) -> list:
+    """Wall time of a fresh interpreter importing main (interpreter start included)"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, env=_env(), check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def measure_cold_start(runs: int, port: int, timeout: float) -> list:
+    """Time from process spawn until /ready returns 200"""
+    timings = []
+    env = _env()
+    env["PORT"] = str(port)
+    env["WEB_CONCURRENCY"] = "1"
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "serve.py"], cwd=BACKEND_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not _wait_for(f"http://127.0.0.1:{port}/ready", start + timeout):
+                raise RuntimeError(f"/ready did not return 200 within {timeout}s")
+            timings.append(time.perf_counter() - start)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return timings
+
+
+def _report(name: str, timings: list, budget: float) -> bool:
+    median = statistics.median(timings)
+    ok = median <= budget
+    print(f"{name:<12} median={median * 1000:7.1f}ms  min={min(timings) * 1000:7.1f}ms  "
+          f"max={max(timings) * 1000:7.1f}ms  [{'OK' if ok else 'OVER BUDGET'}]")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend import-time and cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds allowed for cold start")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    args = parser.parse_args()
+
+    ok = _report("import", measure_import(args.runs), args.budget)
+    ok = _report("cold start", measure_cold_start(args.runs, args.port, args.timeout), args.budget) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,24 @@ import json
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 from contextlib import asynccontextmanager
 import uuid
-import base64
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Header, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-import httpx
-import websockets
+from pydantic import BaseModel
 from dotenv import load_dotenv
 
+from rate_limit import QuotaGovernor, QuotaExceeded, Priority, parse_retry_after, estimate_tokens
+from transcript import TranscriptStore, Role
+
+# httpx and websockets are imported lazily (see warm_up) to keep import time low
+if TYPE_CHECKING:
+    import httpx
+    import websockets
+
 # Load environment variables
 load_dotenv()
 
@@ -28,11 +33,17 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_REALTIME_URL = "wss://api.openai.com/v1/realtime"
-OPENAI_API_BASE = "https://api.openai.com/v1"
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+REALTIME_MODEL = "gpt-realtime"
+ANALYSIS_MODEL = "gpt-4"
+# Sent as max_tokens on analysis requests and reserved with the governor up front
+ANALYSIS_MAX_OUTPUT_TOKENS = 1000
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
+def require_api_key():
+    """Fail startup when the OpenAI key is missing (checked at startup, not import)"""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
 
 # Pydantic Models
 class EphemeralTokenRequest(BaseModel):
@@ -72,40 +83,63 @@ class SessionUpdate(BaseModel):
 
 class RealtimeSession:
     """Manages a realtime voice session"""
+
+    # Slotted to keep per-session overhead low with many concurrent sessions
+    __slots__ = (
+        "session_id", "call_id", "websocket_to_openai", "client_websocket",
+        "is_active", "transcript_buffer", "metadata",
+    )
     
     def __init__(self, session_id: str, call_id: Optional[str] = None):
         self.session_id = session_id
         self.call_id = call_id
-        self.websocket_to_openai: Optional[websockets.WebSocketClientProtocol] = None
+        self.websocket_to_openai: Optional["websockets.WebSocketClientProtocol"] = None
         self.client_websocket: Optional[WebSocket] = None
         self.is_active = False
-        self.transcript_buffer = []
-        self.metadata = {}
+        self.transcript_buffer = TranscriptStore()
+        self.metadata: Optional[Dict[str, Any]] = None
         
     async def connect_to_openai(self, call_id: Optional[str] = None):
-        """Establish WebSocket connection to OpenAI Realtime API"""
+        """Establish WebSocket connection to OpenAI Realtime API
+
+        Raises QuotaExceeded when the connect is shed by the quota governor.
+        """
         try:
+            import websockets
+
             url = OPENAI_REALTIME_URL
             if call_id:
                 url = f"{url}?call_id={call_id}"
             else:
-                url = f"{url}?model=gpt-realtime"
+                url = f"{url}?model={REALTIME_MODEL}"
                 
             headers = {
                 "Authorization": f"Bearer {OPENAI_API_KEY}",
                 "OpenAI-Beta": "realtime=v1"
             }
             
+            await quota_governor.acquire(REALTIME_MODEL, priority=Priority.REALTIME)
             self.websocket_to_openai = await websockets.connect(url, extra_headers=headers)
             self.is_active = True
             logger.info(f"Connected to OpenAI Realtime API for session {self.session_id}")
             return True
+        except QuotaExceeded as e:
+            logger.warning(f"Realtime connect shed for session {self.session_id}: {str(e)}")
+            raise
         except Exception as e:
+            # Handshake rejected with 429: pause the model for Retry-After
+            response = getattr(e, "response", None)
+            status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+            if status == 429:
+                headers = getattr(e, "headers", None) or getattr(response, "headers", None) or {}
+                quota_governor.penalize(REALTIME_MODEL, parse_retry_after(headers.get("Retry-After")))
             logger.error(f"Failed to connect to OpenAI: {str(e)}")
             return False
     
     async def relay_messages(self):
         """Relay messages between client and OpenAI"""
+        import websockets
+
         try:
             while self.is_active:
                 # Wait for messages from OpenAI
@@ -132,23 +166,15 @@ class RealtimeSession:
         
         # Capture transcription events
         if event_type == "conversation.item.input_audio_transcription.completed":
-            transcript = event.get("transcript", "")
-            self.transcript_buffer.append({
-                "timestamp": datetime.utcnow().isoformat(),
-                "type": "user",
-                "text": transcript
-            })
+            self.transcript_buffer.append(Role.USER, event.get("transcript", ""))
         elif event_type == "response.audio_transcript.done":
-            transcript = event.get("transcript", "")
-            self.transcript_buffer.append({
-                "timestamp": datetime.utcnow().isoformat(),
-                "type": "assistant",
-                "text": transcript
-            })
+            self.transcript_buffer.append(Role.ASSISTANT, event.get("transcript", ""))
         elif event_type == "response.done":
-            # Log response completion for analytics
-            if event.get("response", {}).get("usage"):
-                logger.info(f"Usage for session {self.session_id}: {event['response']['usage']}")
+            # Log response completion for analytics and charge the quota governor
+            usage = event.get("response", {}).get("usage")
+            if usage:
+                logger.info(f"Usage for session {self.session_id}: {usage}")
+                quota_governor.record_usage(REALTIME_MODEL, usage.get("total_tokens", 0))
     
     async def send_to_openai(self, message: Dict[str, Any]):
         """Send message to OpenAI Realtime API"""
@@ -188,15 +214,81 @@ class SessionManager:
 # Initialize session manager
 session_manager = SessionManager()
 
+# Initialize upstream quota governor (shared by every OpenAI-bound call in this worker)
+quota_governor = QuotaGovernor.from_env()
+
+def raise_for_upstream_throttle(response: "httpx.Response", model: str):
+    """Surface an upstream 429 as our own 429 after pausing the model for Retry-After"""
+    if response.status_code == 429:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        quota_governor.penalize(model, retry_after)
+        raise HTTPException(
+            status_code=429,
+            detail="OpenAI rate limit reached",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+
+def quota_exceeded_response(e: QuotaExceeded) -> HTTPException:
+    """429 for work shed by the quota governor"""
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, round(e.retry_after)))}
+    )
+
+WARM_UP_ATTEMPTS = 3
+
+async def warm_up(app: FastAPI):
+    """Import heavy dependencies and create the shared HTTP client, then mark the app ready
+
+    Retries with backoff; if every attempt fails, /health reports unhealthy so
+    the orchestrator restarts the process instead of keeping it unready forever.
+    """
+    for attempt in range(1, WARM_UP_ATTEMPTS + 1):
+        try:
+            import httpx
+            import websockets  # noqa: F401 - pre-import so the first realtime connect does not pay for it
+
+            app.state.http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+            app.state.ready = True
+            logger.info("Backend warm-up complete, ready for traffic")
+            return
+        except Exception as e:
+            logger.error(f"Backend warm-up attempt {attempt}/{WARM_UP_ATTEMPTS} failed: {str(e)}")
+            if attempt < WARM_UP_ATTEMPTS:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+    app.state.warm_up_failed = True
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Shared pooled HTTP client created during warm-up"""
+    client = getattr(app.state, "http_client", None)
+    if client is None:
+        raise HTTPException(status_code=503, detail="Service is warming up")
+    return client
+
 # FastAPI app with lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting FastAPI Realtime Voice Backend")
+    require_api_key()
+    app.state.ready = False
+    app.state.warm_up_failed = False
+    app.state.http_client = None
+    # Warm in the background so /health answers while /ready still reports 503
+    warm_task = asyncio.create_task(warm_up(app))
     yield
     # Shutdown - clean up all sessions
+    app.state.ready = False
+    if not warm_task.done():
+        warm_task.cancel()
     for session_id in list(session_manager.sessions.keys()):
         await session_manager.remove_session(session_id)
+    if app.state.http_client is not None:
+        await app.state.http_client.aclose()
     logger.info("Shutting down FastAPI Realtime Voice Backend")
 
 app = FastAPI(
@@ -214,11 +306,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Health check endpoint
+# Health check endpoint (liveness)
 @app.get("/health")
 async def health_check():
+    if getattr(app.state, "warm_up_failed", False):
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "reason": "warm-up failed"})
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+# Readiness probe - only succeeds once warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "timestamp": datetime.utcnow().isoformat()}
+
 # Generate ephemeral token for client-side WebRTC connection
 @app.post("/api/token")
 async def generate_ephemeral_token(request: EphemeralTokenRequest):
@@ -228,7 +329,7 @@ async def generate_ephemeral_token(request: EphemeralTokenRequest):
         session_config = {
             "session": {
                 "type": "realtime",
-                "model": "gpt-realtime",
+                "model": REALTIME_MODEL,
                 "audio": {
                     "input": {
                         "format": "pcm16",
@@ -270,26 +371,32 @@ async def generate_ephemeral_token(request: EphemeralTokenRequest):
             session_config["session"].update(request.session_config)
         
         # Request ephemeral token from OpenAI
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OPENAI_API_BASE}/realtime/client_secrets",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json=session_config
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to generate token")
-            
-            data = response.json()
-            return {
-                "value": data.get("value"),
-                "expires_at": data.get("expires_at"),
-                "session_config": session_config["session"]
-            }
-            
+        client = get_http_client()
+        await quota_governor.acquire(REALTIME_MODEL, priority=Priority.INTERACTIVE)
+        response = await client.post(
+            f"{OPENAI_API_BASE}/realtime/client_secrets",
+            headers={
+                "Authorization": f"Bearer {OPENAI_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json=session_config
+        )
+        
+        raise_for_upstream_throttle(response, REALTIME_MODEL)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="Failed to generate token")
+        
+        data = response.json()
+        return {
+            "value": data.get("value"),
+            "expires_at": data.get("expires_at"),
+            "session_config": session_config["session"]
+        }
+        
+    except QuotaExceeded as e:
+        raise quota_exceeded_response(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating ephemeral token: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -306,7 +413,17 @@ async def websocket_realtime_session(websocket: WebSocket, session_id: str):
     
     try:
         # Connect to OpenAI
-        connected = await session.connect_to_openai()
+        try:
+            connected = await session.connect_to_openai()
+        except QuotaExceeded as e:
+            # Same back-off hint the HTTP endpoints give with 429 + Retry-After
+            await websocket.send_json({
+                "type": "error",
+                "error": str(e),
+                "error_type": "rate_limit_exceeded",
+                "retry_after": max(1, round(e.retry_after))
+            })
+            return
         if not connected:
             await websocket.send_json({
                 "type": "error",
@@ -473,6 +590,19 @@ async def get_scenario(scenario_id: str):
     
     return scenario_configs[scenario_id]
 
+# Session transcript endpoint
+@app.get("/api/sessions/{session_id}/transcript")
+async def get_session_transcript(session_id: str):
+    """Get the buffered transcript of an active session"""
+    session = session_manager.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {
+        "session_id": session_id,
+        "transcript": session.transcript_buffer.to_list()
+    }
+
 # Feedback and analytics endpoints
 @app.post("/api/feedback/analyze")
 async def analyze_feedback(analysis: FeedbackAnalysis):
@@ -485,12 +615,17 @@ async def analyze_feedback(analysis: FeedbackAnalysis):
         
         # Prepare transcript for analysis
         transcript_text = "\n".join([
-            f"{t['type']}: {t['text']}" 
-            for t in session.transcript_buffer
+            f"{role}: {text}" 
+            for role, text in session.transcript_buffer
         ])
         
         # Use OpenAI API to analyze the conversation
-        async with httpx.AsyncClient() as client:
+        client = get_http_client()
+        reserved_tokens = estimate_tokens(transcript_text, ANALYSIS_MAX_OUTPUT_TOKENS)
+        await quota_governor.acquire(ANALYSIS_MODEL, tokens=reserved_tokens, priority=Priority.BATCH)
+        # Settled in the finally: nothing if the request failed, else the reported usage
+        used_tokens = 0
+        try:
             response = await client.post(
                 f"{OPENAI_API_BASE}/chat/completions",
                 headers={
@@ -498,7 +633,7 @@ async def analyze_feedback(analysis: FeedbackAnalysis):
                     "Content-Type": "application/json"
                 },
                 json={
-                    "model": "gpt-4",
+                    "model": ANALYSIS_MODEL,
                     "messages": [
                         {
                             "role": "system",
@@ -518,24 +653,36 @@ async def analyze_feedback(analysis: FeedbackAnalysis):
                         }
                     ],
                     "temperature": 0.3,
+                    "max_tokens": ANALYSIS_MAX_OUTPUT_TOKENS,
                     "response_format": {"type": "json_object"}
                 }
             )
             
             if response.status_code != 200:
+                raise_for_upstream_throttle(response, ANALYSIS_MODEL)
                 raise HTTPException(status_code=response.status_code, detail="Analysis failed")
             
+            # The request ran: charge the estimate unless usage says otherwise
+            used_tokens = reserved_tokens
             result = response.json()
-            feedback = json.loads(result["choices"][0]["message"]["content"])
-            
-            # Add metadata
-            feedback["session_id"] = analysis.session_id
-            feedback["scenario_id"] = analysis.scenario_id
-            feedback["duration_seconds"] = analysis.duration_seconds
-            feedback["timestamp"] = datetime.utcnow().isoformat()
-            
-            return feedback
-            
+            used_tokens = result.get("usage", {}).get("total_tokens", reserved_tokens)
+        finally:
+            quota_governor.record_usage(ANALYSIS_MODEL, used_tokens, reserved_tokens)
+        
+        feedback = json.loads(result["choices"][0]["message"]["content"])
+        
+        # Add metadata
+        feedback["session_id"] = analysis.session_id
+        feedback["scenario_id"] = analysis.scenario_id
+        feedback["duration_seconds"] = analysis.duration_seconds
+        feedback["timestamp"] = datetime.utcnow().isoformat()
+        
+        return feedback
+        
+    except QuotaExceeded as e:
+        raise quota_exceeded_response(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing feedback: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -704,7 +851,14 @@ async def handle_sip_webhook(data: Dict[str, Any], background_tasks: BackgroundT
         session = session_manager.create_session(session_id, call_id)
         
         # Connect to the call in the background
-        background_tasks.add_task(session.connect_to_openai, call_id)
+        async def connect_call():
+            try:
+                await session.connect_to_openai(call_id)
+            except QuotaExceeded:
+                # Already logged; drop the session rather than keep a dead call around
+                await session_manager.remove_session(session_id)
+
+        background_tasks.add_task(connect_call)
         
         return {
             "status": "accepted",
@@ -715,5 +869,5 @@ async def handle_sip_webhook(data: Dict[str, Any], background_tasks: BackgroundT
     return {"status": "processed"}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from serve import main as serve_main
+    serve_main()
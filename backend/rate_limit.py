@@ -0,0 +1,211 @@
+# Upstream quota governor for OpenAI-bound traffic
+# rate_limit.py
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from enum import IntEnum
+from typing import Optional, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests/min and tokens/min per model; override with OPENAI_RATE_LIMITS
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-realtime": (200, 40000),
+    "gpt-4": (500, 10000),
+}
+FALLBACK_LIMIT: Tuple[int, int] = (500, 30000)
+
+
+class Priority(IntEnum):
+    """Lower value is served first and is allowed to queue longer"""
+    REALTIME = 0
+    INTERACTIVE = 1
+    BATCH = 2
+
+
+# Longest a caller of each priority will queue before being shed (seconds)
+DEFAULT_MAX_WAIT: Dict[Priority, float] = {
+    Priority.REALTIME: 10.0,
+    Priority.INTERACTIVE: 5.0,
+    Priority.BATCH: 2.0,
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when work is shed because the quota would not free up in time"""
+
+    def __init__(self, model: str, retry_after: float):
+        self.model = model
+        self.retry_after = max(retry_after, 0.0)
+        super().__init__(f"OpenAI quota exhausted for {model}, retry after {self.retry_after:.1f}s")
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized for one minute of budget"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (amounts above capacity wait for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def consume(self, amount: float):
+        # May go negative: actual usage reported later is charged as debt
+        self.level -= amount
+
+
+class ModelQuota:
+    """Request and token buckets for a single model plus its priority queue"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.queue: list = []
+        self.changed = asyncio.Condition()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now),
+        )
+
+
+class QuotaGovernor:
+    """Central async governor that keeps OpenAI traffic just under quota
+
+    Callers `acquire` a request slot and an estimated token budget before
+    hitting OpenAI, then report actual `usage` with `record_usage`. Waiters
+    are served in priority order; a caller that would wait longer than its
+    priority allows is shed with `QuotaExceeded`. A 429 from upstream should
+    be passed to `penalize` so the model is paused for its Retry-After.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        headroom: float = 0.9,
+        max_wait: Optional[Dict[Priority, float]] = None,
+    ):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.headroom = headroom
+        self.max_wait = dict(DEFAULT_MAX_WAIT if max_wait is None else max_wait)
+        self.models: Dict[str, ModelQuota] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "QuotaGovernor":
+        """Build from OPENAI_RATE_LIMITS ({"model": {"rpm": .., "tpm": ..}}) and OPENAI_QUOTA_HEADROOM
+
+        The account quota is split evenly across WEB_CONCURRENCY worker processes.
+        """
+        limits = dict(DEFAULT_LIMITS)
+        raw = os.getenv("OPENAI_RATE_LIMITS")
+        if raw:
+            try:
+                for model, cfg in json.loads(raw).items():
+                    limits[model] = (int(cfg["rpm"]), int(cfg["tpm"]))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Ignoring invalid OPENAI_RATE_LIMITS: {str(e)}")
+        headroom = 0.9
+        raw = os.getenv("OPENAI_QUOTA_HEADROOM")
+        if raw:
+            try:
+                value = float(raw)
+                if not value > 0:
+                    raise ValueError("must be greater than 0")
+                if value > 1:
+                    logger.warning(f"OPENAI_QUOTA_HEADROOM {raw!r} exceeds the quota, clamping to 1")
+                headroom = min(value, 1.0)
+            except ValueError as e:
+                logger.warning(f"Ignoring invalid OPENAI_QUOTA_HEADROOM {raw!r}: {str(e)}")
+        try:
+            workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        except ValueError:
+            workers = 1
+        return cls(limits=limits, headroom=headroom / workers)
+
+    def _quota(self, model: str) -> ModelQuota:
+        quota = self.models.get(model)
+        if quota is None:
+            rpm, tpm = self.limits.get(model, FALLBACK_LIMIT)
+            quota = ModelQuota(max(1, int(rpm * self.headroom)), max(1, int(tpm * self.headroom)))
+            self.models[model] = quota
+        return quota
+
+    async def acquire(self, model: str, tokens: int = 0, priority: Priority = Priority.INTERACTIVE):
+        """Wait for one request slot and `tokens` of budget, or raise QuotaExceeded"""
+        quota = self._quota(model)
+        deadline = time.monotonic() + self.max_wait.get(priority, 0.0)
+        entry = (int(priority), next(self._seq))
+
+        async with quota.changed:
+            heapq.heappush(quota.queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    if quota.queue[0] == entry:
+                        wait = quota.wait_time(tokens, now)
+                        if wait <= 0:
+                            quota.requests.consume(1)
+                            quota.tokens.consume(tokens)
+                            return
+                        if wait > remaining:
+                            raise QuotaExceeded(model, wait)
+                    elif remaining <= 0:
+                        raise QuotaExceeded(model, quota.wait_time(tokens, now))
+                    else:
+                        # Not at the head: sleep until notified or our deadline passes
+                        wait = remaining
+                    try:
+                        await asyncio.wait_for(quota.changed.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                quota.queue.remove(entry)
+                heapq.heapify(quota.queue)
+                quota.changed.notify_all()
+
+    def record_usage(self, model: str, used_tokens: int, reserved_tokens: int = 0):
+        """Reconcile the token bucket with actual usage reported by OpenAI"""
+        if used_tokens is None:
+            return
+        self._quota(model).tokens.consume(used_tokens - reserved_tokens)
+
+    def penalize(self, model: str, retry_after: float):
+        """Pause a model after upstream throttling (honors Retry-After)"""
+        quota = self._quota(model)
+        quota.blocked_until = max(quota.blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"OpenAI throttled {model}, pausing for {retry_after:.1f}s")
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header given in seconds, falling back to `default`"""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return default
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Rough prompt size (about four characters per token) plus the output allowance"""
+    return len(text) // 4 + max_output_tokens
@@ -0,0 +1,65 @@
+# Production launcher for the FastAPI backend
+# serve.py
+
+import os
+import logging
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+
+def _has_module(name: str) -> bool:
+    """Check whether an optional module is installed without importing it"""
+    return importlib.util.find_spec(name) is not None
+
+
+def resolve_loop() -> str:
+    """Pick the event loop: UVICORN_LOOP if set, otherwise uvloop when available"""
+    loop = os.getenv("UVICORN_LOOP")
+    if loop:
+        return loop
+    return "uvloop" if _has_module("uvloop") else "asyncio"
+
+
+def resolve_http() -> str:
+    """Pick the HTTP parser: UVICORN_HTTP if set, otherwise httptools when available"""
+    http = os.getenv("UVICORN_HTTP")
+    if http:
+        return http
+    return "httptools" if _has_module("httptools") else "h11"
+
+
+def resolve_workers() -> int:
+    """Worker count from WEB_CONCURRENCY (the uvicorn/gunicorn convention), default 1"""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        logger.warning("Invalid WEB_CONCURRENCY, falling back to a single worker")
+        return 1
+
+
+def main():
+    import uvicorn
+
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    workers = resolve_workers()
+    loop = resolve_loop()
+    http = resolve_http()
+
+    logger.info(f"Starting {workers} worker(s) on {host}:{port} (loop={loop}, http={http})")
+    # An import string is required so each worker process imports the app itself
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        log_level=os.getenv("LOG_LEVEL", "info"),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
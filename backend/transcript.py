@@ -0,0 +1,89 @@
+# Compact columnar transcript storage for realtime sessions
+# transcript.py
+
+import time
+from array import array
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import Optional, Dict, List, Iterator, Tuple
+
+
+class Role(IntEnum):
+    """Speaker of a transcript turn (stored as a single byte)"""
+    USER = 0
+    ASSISTANT = 1
+
+
+ROLE_NAMES = ("user", "assistant")
+
+# Only short turns ("Okay.", "Yes.") repeat often enough to be worth sharing.
+# They go through a bounded per-worker cache rather than sys.intern, whose
+# strings are never freed on CPython 3.12; long text is kept as-is.
+SHARE_MAX_LENGTH = 32
+SHARED_TEXT_LIMIT = 4096
+_shared_texts: Dict[str, str] = {}
+
+
+def _share(text: str) -> str:
+    """Return a shared copy of a short turn; the cache is emptied once it fills up"""
+    if len(text) >= SHARE_MAX_LENGTH:
+        return text
+    shared = _shared_texts.get(text)
+    if shared is None:
+        if len(_shared_texts) >= SHARED_TEXT_LIMIT:
+            _shared_texts.clear()
+        shared = _shared_texts[text] = text
+    return shared
+
+
+class TranscriptStore:
+    """Columnar turn store: monotonic timestamps, role bytes and text (short turns shared)
+
+    Columns are allocated on the first turn so idle sessions cost only the
+    slotted object itself. ISO timestamps are built only when serializing.
+    """
+
+    __slots__ = ("_times", "_roles", "_texts", "_wall_offset")
+
+    def __init__(self):
+        self._times: Optional[array] = None
+        self._roles: Optional[bytearray] = None
+        self._texts: Optional[List[str]] = None
+        self._wall_offset = 0.0
+
+    def append(self, role: Role, text: str):
+        """Record a turn at the current monotonic time"""
+        now = time.monotonic()
+        if self._times is None:
+            # Captured once per transcript to map monotonic time back to wall-clock time
+            self._wall_offset = time.time() - now
+            self._times = array("d")
+            self._roles = bytearray()
+            self._texts = []
+        self._times.append(now)
+        self._roles.append(role)
+        self._texts.append(_share(text))
+
+    def __len__(self) -> int:
+        return 0 if self._texts is None else len(self._texts)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """Yield (role name, text) pairs in order"""
+        if self._texts is None:
+            return
+        for role, text in zip(self._roles, self._texts):
+            yield ROLE_NAMES[role], text
+
+    def to_list(self) -> List[Dict[str, str]]:
+        """Serialize as [{"timestamp", "type", "text"}] with naive UTC ISO timestamps"""
+        if self._texts is None:
+            return []
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(self._wall_offset + at, timezone.utc)
+                .replace(tzinfo=None).isoformat(),
+                "type": ROLE_NAMES[role],
+                "text": text,
+            }
+            for at, role, text in zip(self._times, self._roles, self._texts)
+        ]